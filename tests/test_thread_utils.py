@@ -0,0 +1,35 @@
+import pytest
+
+from threador import thread_utils
+
+
+@pytest.mark.parametrize(
+    'text,length',
+    [
+        # scheme urls
+        ('https://example.com/some/long/path', 23),
+        ('http://localhost:8000', 23),
+        # bare domains with a generic top level domain
+        ('see example.com now', 31),
+        ('www.bbc.co.uk', 23),
+        # short links on any top level domain with a path
+        ('bit.ly/abc', 23),
+        ('t.co/xyz', 23),
+        ('youtu.be/dQw4w9WgXcQ', 23),
+        ('bbc.co.uk/news', 23),
+        # not urls
+        ('me@example.com', 14),
+        ('file.py', 7),
+        ('Node.js', 7),
+        ('e.g. i.e. Mr.Smith', 18),
+        # trailing punctuation is counted separately
+        ('see https://example.com/foo.', 28),
+        ('(https://example.com/foo)', 25),
+        ('https://example.com/foo, bar', 28),
+        # plain text and emoji
+        ('hello world', 11),
+        ('❤️' * 150, 300),
+    ],
+)
+def test_compute_tweet_length(text: str, length: int) -> None:
+    assert thread_utils.compute_tweet_length(text) == length
@@ -5,7 +5,8 @@
 ## Tweet parsing rules
 - tweets are delimited by one of:
     - 3 or more newlines in a row
-    - a row that contains only horizontal dashes {-, ─}
+    - a row that contains only horizontal dashes {-, ─}, optionally
+      followed by trailing spaces or tabs
 - annotations are lines of a tweet enclosed by square brackets
 
 
@@ -15,7 +16,6 @@
 
 ## TODO
 - special implement detailed char counting rules
-    - urls
     - mentions
     - emojis
     - generic unicode
@@ -23,11 +23,26 @@
 
 from __future__ import annotations
 
+import re
 import typing
+import functools
+import hashlib
 import argparse
+import pathlib
 
 import toolstr
 
+__all__ = (
+    'char_limit',
+    'styles',
+    'parse_args',
+    'str_to_tweets',
+    'compute_tweet_length',
+    'print_tweets',
+    'print_tweet_summary',
+    'main',
+)
+
 if typing.TYPE_CHECKING:
     import typing_extensions
 
@@ -56,6 +71,29 @@ if typing.TYPE_CHECKING:
 
 char_limit = 280
 
+_DASH_LINE_RE = re.compile(r'^[-─]+[ \t]*$', re.MULTILINE)
+
+# twitter counts every url as a t.co link of fixed length. urls without a
+# scheme are recognized with a www. prefix, a generic top level domain, or
+# any top level domain followed by a path. trailing punctuation is not part
+# of a url
+_URL_TLDS = 'com|net|org|edu|gov|mil|int|info|biz|app|dev|xyz'
+_URL_END = r'[^\s.,;:!?)\]\'"]'
+_URL_PATH = r'/(?:\S*' + _URL_END + ')?'
+_URL_RE = re.compile(
+    r'https?://\S*' + _URL_END
+    + r'|(?<![@\w.-])www\.[a-z0-9-]+(?:\.[a-z0-9-]+)+(?:' + _URL_PATH + ')?'
+    + r'|(?<![@\w.-])(?:[a-z0-9-]+\.)+[a-z]{2,}' + _URL_PATH
+    + r'|(?<![@\w.-])(?:[a-z0-9-]+\.)+(?:' + _URL_TLDS + r')(?![\w-])'
+    + '(?:' + _URL_PATH + ')?',
+    re.IGNORECASE,
+)
+_URL_TOKEN = 'X' * 23
+
+# zero-width joiners and emoji variation selectors, to be removed before
+# counting once emoji weighting exists (until then they keep emoji at len 2)
+_STRIP_TABLE = str.maketrans('', '', '\u200d\ufe0f')
+
 styles = {
     'chrome': '#999999',
     'tweet': '#8be9fd',
@@ -123,6 +161,52 @@ def parse_args() -> ScriptArgs:
     }
 
 
+def _parse_section_annotation(
+    annotations: TweetAnnotations, value: str
+) -> None:
+    annotations['section_start'] = value
+
+
+def _parse_image_annotation(annotations: TweetAnnotations, value: str) -> None:
+    annotations['images'].append(value)
+
+
+def _parse_comment_annotation(
+    annotations: TweetAnnotations, value: str
+) -> None:
+    annotations['comments'].append(value)
+
+
+_ANNOTATION_HANDLERS: typing.Mapping[
+    str, typing.Callable[[TweetAnnotations, str], None]
+] = {
+    'section': _parse_section_annotation,
+    'image': _parse_image_annotation,
+    'comment': _parse_comment_annotation,
+}
+
+
+def _iter_raw_tweets(content: str) -> typing.Iterator[typing.Sequence[str]]:
+    """yield the lines of each tweet, splitting on runs of 2+ blank lines"""
+
+    lines: typing.MutableSequence[str] = []
+    blank = 0
+    for line in content.split('\n'):
+        if line == '':
+            blank += 1
+            continue
+        if blank >= 2:
+            if len(lines) > 0:
+                yield lines
+            lines = []
+        elif blank == 1:
+            lines.append('')
+        blank = 0
+        lines.append(line)
+    if len(lines) > 0:
+        yield lines
+
+
 def str_to_tweets(
     content: str,
     add_indices: bool,
@@ -131,27 +215,15 @@ def str_to_tweets(
     """see parsing rules above"""
 
     # remove lines that are purely horizontal dashes
-    lines = content.split('\n')
-    for i, line in enumerate(list(lines)):
-        if len(line) > 0 and set(line).issubset({'-', '─'}):
-            lines[i] = '\n\n\n'
-    content = '\n'.join(lines)
-
-    # get rid of any set of 4 blank lines or more
-    content = content.strip()
-    while '\n\n\n\n' in content:
-        content = content.replace('\n\n\n\n', '\n\n\n')
-
-    # split into raw tweets
-    raw_tweets = content.split('\n\n\n')
+    content = _DASH_LINE_RE.sub('\n\n', content)
 
     # parse raw tweets
     tweets = []
+    sections: typing.MutableSequence[typing.Dict[str, typing.Union[str, int]]]
+    sections = []
     add_toc = False
     stop = False
-    for t, raw_tweet in enumerate(raw_tweets):
-
-        lines = raw_tweet.split('\n')
+    for lines in _iter_raw_tweets(content.strip()):
 
         tweet_lines = []
         annotations: TweetAnnotations = {
@@ -162,31 +234,27 @@ def str_to_tweets(
             'section_start': None,
         }
         for line in lines:
-            if line.startswith('['):
-                line = line.lstrip('[').rstrip(']')
-
-                if line == 'table of contents':
+            if line[:1] == '[' and line[-1:] == ']':
+                inner = line[1:-1]
+                key, sep, value = inner.partition(': ')
+                handler = _ANNOTATION_HANDLERS.get(key) if sep else None
+
+                if handler is not None:
+                    if key == 'image' and add_image_hashes:
+                        image_hash = hashlib.blake2s(
+                            value.encode(), digest_size=5
+                        )
+                        value = f'{image_hash.hexdigest()} {value}'
+                    handler(annotations, value)
+                elif inner == 'table of contents':
                     annotations['table_of_contents'] = True
                     add_toc = True
                     tweet_lines.append('<TOC>')
-                elif line.startswith('section: '):
-                    annotations['section_start'] = line.split(': ')[1]
-                elif line.startswith('image: '):
-                    image = line.split(': ')[1]
-                    if add_image_hashes:
-                        import hashlib
-
-                        image_hash = hashlib.md5(image.encode()).hexdigest()
-                        image_hash = image_hash[:10]
-                        image = image_hash + ' ' + image
-                    annotations['images'].append(image)
-                elif line.startswith('comment: '):
-                    annotations['comments'].append(line.split(': ')[1])
-                elif line == 'stop':
+                elif inner == 'stop':
                     stop = True
                     break
                 else:
-                    annotations['unknown_annotations'].append(line)
+                    annotations['unknown_annotations'].append(inner)
 
             else:
                 tweet_lines.append(line)
@@ -194,74 +262,64 @@ def str_to_tweets(
         text = '\n'.join(tweet_lines)
         text = text.strip()
 
-        # TODO: count length more accurately
-        length = len(text)
-
+        # length is computed below, once text is final
         tweet: Tweet = {
             'text': text,
             'annotations': annotations,
-            'length': length,
+            'length': 0,
         }
 
         tweets.append(tweet)
 
+        # track section boundaries as tweets are added
+        section_start = annotations['section_start']
+        if section_start is not None:
+            if len(sections) > 0:
+                sections[-1]['end'] = len(tweets)
+            sections.append({'name': section_start, 'start': len(tweets)})
+
         if stop:
             break
 
-    if add_toc:
-
-        toc_template = 'table of contents\n{toc_lines}'
+    n_tweets = len(tweets)
 
-        if len(tweets) < 10:
-            toc_section_template = 'tweets {start:01} - {end} = {name}'
-        elif len(tweets) < 100:
-            toc_section_template = 'tweets {start:02} - {end} = {name}'
-        else:
-            toc_section_template = 'tweets {start:03} - {end} = {name}'
+    if add_toc:
 
-        # gather sections
-        sections = []
-        for t, tweet in enumerate(tweets):
-            section_start = tweet['annotations']['section_start']
-            if section_start is not None:
-                sections.append({'name': section_start, 'start': t + 1})
-        for s, section in enumerate(sections[:-1]):
-            sections[s]['end'] = sections[s + 1]['start']
-        sections[-1]['end'] = len(tweets)
+        # close final section
+        if len(sections) > 0:
+            sections[-1]['end'] = n_tweets
 
-        # build toc text
+        # build toc text, padding start indices to the width of the count
+        width = len(str(n_tweets))
         toc_lines = [
-            toc_section_template.format(**section) for section in sections
+            f"tweets {section['start']:0{width}} - {section['end']}"
+            f" = {section['name']}"
+            for section in sections
         ]
-        toc_text = toc_template.format(toc_lines='\n'.join(toc_lines))
+        toc_text = 'table of contents\n' + '\n'.join(toc_lines)
 
         # add toc to tweets
         for tweet in tweets:
             if tweet['annotations']['table_of_contents']:
                 tweet['text'] = tweet['text'].replace('<TOC>', toc_text)
 
-    if add_indices:
-        for t, tweet in enumerate(tweets):
-            tweet['text'] += '\n\n' + str(t + 1) + ' / ' + str(len(tweets))
-
-    for tweet in tweets:
+    for t, tweet in enumerate(tweets):
+        if add_indices:
+            tweet['text'] += f'\n\n{t + 1} / {n_tweets}'
         tweet['length'] = compute_tweet_length(tweet['text'])
 
     return tweets
 
 
+@functools.lru_cache(maxsize=4096)
 def compute_tweet_length(text: str) -> int:
 
-    # replace urls with 13 character tokens
-    tokens = []
-    for token in text.split(' '):
-        if '.' in token and token[-1] != '.' and '..' not in token:
-            token = 'X' * 13
-        tokens.append(token)
-    text = ' '.join(tokens)
+    # TODO: emojis / unicode, weight characters per twitter's counting rules,
+    # then strip zero-width characters with text.translate(_STRIP_TABLE)
 
-    # TODO: emojis / unicode
-    pass
+    # replace urls with 23 character tokens
+    if '.' in text or '://' in text:
+        text = _URL_RE.sub(_URL_TOKEN, text)
 
     return len(text)
 
@@ -272,48 +330,58 @@ def print_tweets(
     oversized_only: bool,
 ) -> None:
 
-    for t, tweet in enumerate(tweets):
+    # bind frequently used functions and styles to locals for the loop
+    rich_print = toolstr.print
+    print_line = toolstr.print_horizontal_line
+    get_outlined_text = toolstr.get_outlined_text
+    chrome_style = styles['chrome']
+    tweet_style = styles['tweet']
+    compliant_style = styles['compliant']
+    near_limit_style = styles['near_limit']
+    violation_style = styles['violation']
+    keys: typing.Sequence[
+        typing_extensions.Literal['comments', 'images', 'unknown_annotations']
+    ] = ['comments', 'images', 'unknown_annotations']
 
-        if oversized_only and tweet['length'] <= char_limit:
+    for tweet in tweets:
+
+        length = tweet['length']
+        if oversized_only and length <= char_limit:
             continue
 
-        toolstr.print_horizontal_line(style=styles['chrome'])
+        annotations = tweet['annotations']
+
+        print_line(style=chrome_style)
         if print_annotations:
-            section_start = tweet['annotations']['section_start']
+            section_start = annotations['section_start']
             if section_start is not None:
-                section_title = toolstr.get_outlined_text(
-                    ' NEW SECTION = ' + section_start,
-                    style=styles['compliant'],
+                section_title = get_outlined_text(
+                    f' NEW SECTION = {section_start}',
+                    style=compliant_style,
                     lower_border=True,
                     left_border=True,
                 )
-                toolstr.print(section_title, justify='right')
+                rich_print(section_title, justify='right')
 
-        toolstr.print(tweet['text'], style=styles['tweet'])
+        rich_print(tweet['text'], style=tweet_style)
 
         if print_annotations:
-            annotations = tweet['annotations']
-            keys: typing.Sequence[
-                typing_extensions.Literal[
-                    'comments', 'images', 'unknown_annotations'
-                ]
-            ] = ['comments', 'images', 'unknown_annotations']
             for key in keys:
                 if len(annotations[key]) > 0:
                     print()
-                    toolstr.print(key, style=styles['chrome'])
+                    rich_print(key, style=chrome_style)
                     for annotation in annotations[key]:
-                        toolstr.print('-', annotation, style=styles['chrome'])
+                        rich_print('-', annotation, style=chrome_style)
 
-        if tweet['length'] > char_limit:
-            metadata_style = styles['violation']
-        elif char_limit - tweet['length'] < 15:
-            metadata_style = styles['near_limit']
+        if length > char_limit:
+            metadata_style = violation_style
+        elif char_limit - length < 15:
+            metadata_style = near_limit_style
         else:
-            metadata_style = styles['compliant']
+            metadata_style = compliant_style
 
-        toolstr.print(
-            'length = ' + str(tweet['length']) + ' chars',
+        rich_print(
+            f'length = {length} chars',
             justify='right',
             style=metadata_style,
         )
@@ -321,31 +389,33 @@ def print_tweets(
 
 def print_tweet_summary(tweets: typing.Sequence[Tweet]) -> None:
 
-    big_tweets = [tweet for tweet in tweets if tweet['length'] > char_limit]
+    # gather oversized tweets and annotations in a single pass
+    limit = char_limit
+    big_tweets = []
+    images: typing.MutableSequence[str] = []
+    unknown_annotations: typing.MutableSequence[str] = []
+    for tweet in tweets:
+        if tweet['length'] > limit:
+            big_tweets.append(tweet)
+        annotations = tweet['annotations']
+        images.extend(annotations['images'])
+        unknown_annotations.extend(annotations['unknown_annotations'])
     n_over_char_limit = len(big_tweets)
 
     toolstr.print_text_box('Tweet thread summary')
     print('- number of tweets:', len(tweets))
     print('- number of tweets over char limit:', n_over_char_limit)
-    if len(big_tweets) > 0:
+    if n_over_char_limit > 0:
         big_tweet_lengths = [str(tweet['length']) for tweet in big_tweets]
-        print('    - lengths: ' + ', '.join(big_tweet_lengths))
+        print(f'    - lengths: {", ".join(big_tweet_lengths)}')
 
-    images = [
-        image for tweet in tweets for image in tweet['annotations']['images']
-    ]
     print()
-    print('images: ' + str(len(images)))
+    print(f'images: {len(images)}')
     for image in images:
-        print('- ' + image)
+        print(f'- {image}')
 
-    unknown_annotations = [
-        annotation
-        for tweet in tweets
-        for annotation in tweet['annotations']['unknown_annotations']
-    ]
     print()
-    print('unknown_annotations: ' + str(len(unknown_annotations)))
+    print(f'unknown_annotations: {len(unknown_annotations)}')
     for annotation in unknown_annotations:
         print('-', annotation)
 
@@ -356,9 +426,7 @@ def main() -> None:
     args = parse_args()
 
     # load markdown file
-    path = args['path']
-    with open(path, 'r') as f:
-        content = f.read()
+    content = pathlib.Path(args['path']).read_text(encoding='utf-8')
 
     # process markdown content
     tweets = str_to_tweets(